@@ -12,13 +12,23 @@ import json
 from src.utils.file_handler import FileHandler
 from src.processor.conversation import ConversationProcessor
 
-def get_pricing_info() -> str:
-    """Get formatted pricing information.
-    
-    Returns:
-        Pricing information string
-    """
-    return """
+# Mirrors the MODEL_CONFIGS keys of each provider so --help can be rendered
+# without reading the config file
+KNOWN_MODELS = {
+    'openai': ['gpt-4o', 'gpt-4o-mini'],
+    'anthropic': ['claude-3-opus-latest', 'claude-3-sonnet-latest', 'claude-3-haiku-latest'],
+    'gemini': ['gemini-2.0-flash', 'gemini-1.5-flash', 'gemini-1.5-pro'],
+    'novelai': ['erato', 'kayra', 'clio', 'krake']
+}
+
+PROVIDER_LABELS = {
+    'openai': 'OpenAI',
+    'anthropic': 'Anthropic',
+    'gemini': 'Gemini',
+    'novelai': 'NovelAI'
+}
+
+_PRICING = """
 pricing:
   OpenAI:     Pay per token ($2.50-$10.00 per 1M tokens)
   Anthropic:  Pay per token ($0.80-$75.00 per 1M tokens)
@@ -27,13 +37,7 @@ pricing:
 
 For detailed model comparison and pricing, see docs/model_comparison.md"""
 
-def get_examples() -> str:
-    """Get formatted usage examples.
-    
-    Returns:
-        Examples string
-    """
-    return """
+_EXAMPLES = """
 examples:
   # Generate narrative using default model (gpt-4o)
   python narrative_writer.py input.json output.txt
@@ -44,31 +48,7 @@ examples:
   # Use custom config
   python narrative_writer.py input.json output.txt --config custom_config.json"""
 
-def load_available_models(config_path: str) -> Dict[str, list]:
-    """Load available models from config.
-    
-    Args:
-        config_path: Path to config file
-        
-    Returns:
-        Dictionary of provider -> list of models
-    """
-    config = FileHandler.load_config(config_path)
-    return config.get('available_models', {})
-
-def get_all_models(available_models: Dict[str, List[str]]) -> List[str]:
-    """Get flat list of all available models.
-    
-    Args:
-        available_models: Dictionary of provider -> list of models
-        
-    Returns:
-        List of all model names
-    """
-    all_models = []
-    for provider_models in available_models.values():
-        all_models.extend(provider_models)
-    return all_models
+_EPILOG = _EXAMPLES + _PRICING
 
 def parse_args() -> argparse.Namespace:
     """Parse command line arguments.
@@ -76,18 +56,11 @@ def parse_args() -> argparse.Namespace:
     Returns:
         Parsed arguments
     """
-    # Load available models
-    try:
-        available_models = load_available_models('config.json')
-        all_models = get_all_models(available_models)
-    except:
-        all_models = ['gpt-4o', 'gpt-4o-mini']  # Fallback defaults
-    
     # Create parser with custom formatting
     parser = argparse.ArgumentParser(
         description='Convert roleplay conversations to narrative form',
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog=get_examples() + get_pricing_info(),
+        epilog=_EPILOG,
         usage='%(prog)s [-h] [--config CONFIG] [--model MODEL] input_file output_file'
     )
     
@@ -107,17 +80,12 @@ def parse_args() -> argparse.Namespace:
         help='Path to configuration file (default: config.json)'
     )
     
-    model_help = (
-        'Model to use (default: gpt-4o)\n'
-        'Available models:\n'
-        '  OpenAI:    gpt-4o, gpt-4o-mini\n'
-        '  Anthropic: claude-3-opus-latest, claude-3-sonnet-latest, claude-3-haiku-latest\n'
-        '  Gemini:    gemini-2.0-flash, gemini-1.5-flash, gemini-1.5-pro\n'
-        '  NovelAI:   erato, kayra, clio, krake'
+    model_help = 'Model to use (default: gpt-4o)\nAvailable models:\n' + '\n'.join(
+        f"  {(PROVIDER_LABELS[provider] + ':').ljust(10)} {', '.join(models)}"
+        for provider, models in KNOWN_MODELS.items()
     )
     parser.add_argument(
         '--model',
-        choices=all_models,
         default='gpt-4o',
         metavar='MODEL',
         help=model_help
@@ -125,23 +93,16 @@ def parse_args() -> argparse.Namespace:
     
     return parser.parse_args()
 
-def get_provider_for_model(model: str, available_models: Dict[str, list]) -> str:
-    """Get the provider for a given model.
+def _index_models(available_models: Dict[str, List[str]]) -> Dict[str, str]:
+    """Build a reverse index from model name to provider.
     
     Args:
-        model: Model name
         available_models: Dictionary of provider -> list of models
         
     Returns:
-        Provider name
-        
-    Raises:
-        ValueError: If model not found
+        Dictionary of model -> provider
     """
-    for provider, models in available_models.items():
-        if model in models:
-            return provider
-    raise ValueError(f"Model {model} not found in available models")
+    return {model: provider for provider, models in available_models.items() for model in models}
 
 def main() -> int:
     """Main entry point.
@@ -154,11 +115,15 @@ def main() -> int:
         
         # Load configuration
         config = FileHandler.load_config(args.config)
-        available_models = config.get('available_models', {})
         
-        # Override model version if specified
-        if args.model:
-            provider = get_provider_for_model(args.model, available_models)
+        # Override model version if specified and different from the config
+        if args.model is not None and args.model != config['llm'].get('model_version'):
+            available_models = config.get('available_models', KNOWN_MODELS)
+            model_to_provider = _index_models(available_models)
+            try:
+                provider = model_to_provider[args.model]
+            except KeyError:
+                raise ValueError(f"Invalid model: {args.model}. Must be one of {list(model_to_provider)}")
             config['llm']['provider'] = provider
             config['llm']['model_version'] = args.model
         
@@ -166,7 +131,14 @@ def main() -> int:
         processor = ConversationProcessor(config)
         
         # Process conversation
-        processor.process_conversation(args.input_file, args.output_file)
+        try:
+            processor.process_conversation(args.input_file, args.output_file)
+        finally:
+            # Don't let a failed close() hide the processing error
+            try:
+                processor.close()
+            except Exception as e:
+                print(f"Warning: failed to close provider: {str(e)}", file=sys.stderr)
         
         print(f"Successfully generated narrative: {args.output_file}")
         return 0
@@ -180,6 +152,9 @@ def main() -> int:
     except ValueError as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         return 1
+    except OSError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
     except Exception as e:
         print(f"Unexpected error: {str(e)}", file=sys.stderr)
         return 1
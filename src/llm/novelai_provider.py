@@ -4,37 +4,51 @@ This module implements the NovelAI provider for narrative generation.
 """
 
 import os
-import asyncio
-from typing import Dict, Any, Optional, List
-import importlib
+from typing import Dict, Any, Optional, List, Callable
 
-from .provider import LLMProvider
+from .provider import LLMProvider, freeze_model_configs
+
+# NovelAI dependencies, populated by get_novelai_imports() on first use
+_NAI_CACHE = None
+
+# Model name -> novelai_api Model enum, filled in alongside _NAI_CACHE
+_NAI_MODEL_ENUM: Dict[str, Any] = {}
 
 # Lazy imports for NovelAI dependencies
 def get_novelai_imports():
     """Get NovelAI dependencies, importing only when needed."""
+    global _NAI_CACHE
+    if _NAI_CACHE is not None:
+        return _NAI_CACHE
+    
     try:
-        BanList = importlib.import_module('novelai_api.BanList').BanList
-        BiasGroup = importlib.import_module('novelai_api.BiasGroup').BiasGroup
-        GlobalSettings = importlib.import_module('novelai_api.GlobalSettings').GlobalSettings
-        Model = importlib.import_module('novelai_api.Preset').Model
-        Preset = importlib.import_module('novelai_api.Preset').Preset
-        PREAMBLE = importlib.import_module('novelai_api.Preset').PREAMBLE
-        Tokenizer = importlib.import_module('novelai_api.Tokenizer').Tokenizer
-        b64_to_tokens = importlib.import_module('novelai_api.utils').b64_to_tokens
-        API = importlib.import_module('example.boilerplate').API
-        return BanList, BiasGroup, GlobalSettings, Model, Preset, PREAMBLE, Tokenizer, b64_to_tokens, API
+        from novelai_api.BanList import BanList
+        from novelai_api.BiasGroup import BiasGroup
+        from novelai_api.GlobalSettings import GlobalSettings
+        from novelai_api.Preset import Model, Preset, PREAMBLE
+        from novelai_api.Tokenizer import Tokenizer
+        from novelai_api.utils import b64_to_tokens
+        from example.boilerplate import API
     except ImportError as e:
         raise ImportError(f"NovelAI dependencies not found. Please install novelai-api package: {str(e)}")
+    
+    _NAI_MODEL_ENUM.update({
+        'erato': Model.Erato,
+        'kayra': Model.Kayra,
+        'clio': Model.Clio,
+        'krake': Model.Krake
+    })
+    _NAI_CACHE = (BanList, BiasGroup, GlobalSettings, Model, Preset, PREAMBLE, Tokenizer, b64_to_tokens, API)
+    return _NAI_CACHE
 
 class NovelAIProvider(LLMProvider):
     # Import dependencies only when class is used
     BanList, BiasGroup, GlobalSettings, Model, Preset, PREAMBLE, Tokenizer, b64_to_tokens, API = None, None, None, None, None, None, None, None, None
     """NovelAI-specific LLM provider implementation."""
     
-    MODEL_CONFIGS = {
+    MODEL_CONFIGS = freeze_model_configs({
         "erato": {
-            "model": "erato",  # Will be converted to Model.Erato when needed
+            "model": "erato",  # Resolved to Model.Erato via _NAI_MODEL_ENUM
             "max_input_tokens": 16384,
             "max_output_tokens": 4096,
             "bytes_per_token": 4,  # Erato uses 4 bytes per token
@@ -42,7 +56,7 @@ class NovelAIProvider(LLMProvider):
             "subscription": "$20/month unlimited"
         },
         "kayra": {
-            "model": "kayra",  # Will be converted to Model.Kayra when needed
+            "model": "kayra",  # Resolved to Model.Kayra via _NAI_MODEL_ENUM
             "max_input_tokens": 8192,
             "max_output_tokens": 4096,
             "bytes_per_token": 2,
@@ -50,7 +64,7 @@ class NovelAIProvider(LLMProvider):
             "subscription": "$20/month unlimited"
         },
         "clio": {
-            "model": "clio",  # Will be converted to Model.Clio when needed
+            "model": "clio",  # Resolved to Model.Clio via _NAI_MODEL_ENUM
             "max_input_tokens": 8192,
             "max_output_tokens": 4096,
             "bytes_per_token": 2,
@@ -58,14 +72,14 @@ class NovelAIProvider(LLMProvider):
             "subscription": "$20/month unlimited"
         },
         "krake": {
-            "model": "krake",  # Will be converted to Model.Krake when needed
+            "model": "krake",  # Resolved to Model.Krake via _NAI_MODEL_ENUM
             "max_input_tokens": 8192,
             "max_output_tokens": 4096,
             "bytes_per_token": 2,
             "preset": "Storywriter",
             "subscription": "$20/month unlimited"
         }
-    }
+    })
     
     def __init__(self, config: Dict[str, Any]):
         """Initialize NovelAI provider.
@@ -80,7 +94,7 @@ class NovelAIProvider(LLMProvider):
         if model_version not in self.MODEL_CONFIGS:
             raise ValueError(f"Invalid model version: {model_version}. Must be one of {list(self.MODEL_CONFIGS.keys())}")
             
-        model_config = self.MODEL_CONFIGS[model_version]
+        model_config = dict(self.MODEL_CONFIGS[model_version])
         
         # Update config with model-specific settings
         config['model'] = model_config['model']
@@ -91,23 +105,33 @@ class NovelAIProvider(LLMProvider):
         # Store model config for later use
         self.model_config = model_config
         
+        # NovelAI limits concurrent generations per account, so batches run
+        # one request at a time
+        self.batch_concurrency = 1
+        
         # Import dependencies if not already imported
         if NovelAIProvider.API is None:
             (NovelAIProvider.BanList, NovelAIProvider.BiasGroup, NovelAIProvider.GlobalSettings,
              NovelAIProvider.Model, NovelAIProvider.Preset, NovelAIProvider.PREAMBLE,
              NovelAIProvider.Tokenizer, NovelAIProvider.b64_to_tokens, NovelAIProvider.API) = get_novelai_imports()
         
-        # Convert string model name to Model enum
-        model_enum = getattr(NovelAIProvider.Model, self.model_config['model'].capitalize())
-        self.model_config['model'] = model_enum
+        # Resolve the Model enum without touching the shared MODEL_CONFIGS entry
+        self.model_enum = _NAI_MODEL_ENUM[self.model_config['model']]
+        
+        # Model-specific preamble prepended to every prompt
+        self._preamble = NovelAIProvider.PREAMBLE[self.model_enum]
         
         # Initialize API client
         self.api_handler = NovelAIProvider.API()
         self.api = self.api_handler.api
         
+        # The API session (and its login) is opened on first use and reused by
+        # every generate() call on the provider's event loop
+        self._session_open = False
+        
         # Load preset
         self.preset = NovelAIProvider.Preset.from_official(
-            self.model_config['model'],
+            self.model_enum,
             self.model_config['preset']
         )
         
@@ -125,6 +149,12 @@ class NovelAIProvider(LLMProvider):
         self.bias_groups: List[Any] = []  # Can be used for narrative control
         self.module = None  # Can be set for genre-specific generation
         self.stop_sequence = ["\n\n"]  # Default stop sequence for chunking
+        
+        # Tokenize the stop sequences once instead of on every request
+        self._stop_ids = [
+            NovelAIProvider.Tokenizer.encode(self.model_enum, sequence)
+            for sequence in self.stop_sequence
+        ]
     
     def count_tokens(self, text: str) -> int:
         """Count tokens using NovelAI's tokenizer.
@@ -135,7 +165,7 @@ class NovelAIProvider(LLMProvider):
         Returns:
             Number of tokens in the text
         """
-        return len(NovelAIProvider.Tokenizer.encode(self.model_config['model'], text))
+        return len(NovelAIProvider.Tokenizer.encode(self.model_enum, text))
     
     def calculate_cost(self, input_tokens: int, output_tokens: int) -> Dict[str, float]:
         """Calculate cost for NovelAI token usage.
@@ -157,12 +187,14 @@ class NovelAIProvider(LLMProvider):
             'subscription': "$20/month unlimited"
         }
     
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                 stream_callback: Optional[Callable[[str], None]] = None) -> str:
         """Generate text using NovelAI's API.
         
         Args:
             prompt: The main prompt text
             system_prompt: Optional system instructions
+            stream_callback: Optional callable receiving the full output text
             
         Returns:
             Generated text response
@@ -170,21 +202,68 @@ class NovelAIProvider(LLMProvider):
         Raises:
             Exception: If the API call fails
         """
-        # Combine prompts with model preamble
-        full_prompt = PREAMBLE[self.model_config['model']]
-        if system_prompt:
-            full_prompt += f"\n{system_prompt}"
-        full_prompt += f"\n{prompt}"
+        full_prompt = self._build_prompt(prompt, system_prompt)
+        
+        try:
+            # Run async generation on the provider's event loop
+            output_text = self._run(self._generate_async(full_prompt))
+            if stream_callback:
+                stream_callback(output_text)
+            return output_text
+            
+        except Exception as e:
+            raise Exception(f"NovelAI API error: {str(e)}")
+    
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Generate text using NovelAI's API on the provider's event loop.
         
+        Args:
+            prompt: The main prompt text
+            system_prompt: Optional system instructions
+            
+        Returns:
+            Generated text response
+            
+        Raises:
+            Exception: If the API call fails
+        """
         try:
-            # Run async generation in sync context
-            loop = asyncio.get_event_loop()
-            response = loop.run_until_complete(self._generate_async(full_prompt))
-            return response
+            return await self._generate_async(self._build_prompt(prompt, system_prompt))
             
         except Exception as e:
             raise Exception(f"NovelAI API error: {str(e)}")
     
+    def close(self) -> None:
+        """Close the NovelAI API session and the provider's event loop."""
+        if self._session_open:
+            self._session_open = False
+            self._run(self.api_handler.__aexit__(None, None, None))
+        super().close()
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
+    def _build_prompt(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Combine prompts with the model preamble.
+        
+        Args:
+            prompt: The main prompt text
+            system_prompt: Optional system instructions
+            
+        Returns:
+            Full prompt text
+        """
+        return "\n".join(filter(None, [self._preamble, system_prompt, prompt]))
+    
+    async def _enter_api(self) -> None:
+        """Open the NovelAI API session and log in, once per provider."""
+        if not self._session_open:
+            await self.api_handler.__aenter__()
+            self._session_open = True
+    
     async def _generate_async(self, prompt: str) -> str:
         """Async implementation of text generation.
         
@@ -194,21 +273,42 @@ class NovelAIProvider(LLMProvider):
         Returns:
             Generated text response
         """
-        async with self.api_handler as api:
-            response = await api.high_level.generate(
-                prompt,
-                self.model_config['model'],
-                self.preset,
-                self.global_settings,
-                bad_words=self.bad_words,
-                biases=self.bias_groups,
-                prefix=self.module,
-                stop_sequences=self.stop_sequence
-            )
+        await self._enter_api()
+        response = await self.api.high_level.generate(
+            prompt,
+            self.model_enum,
+            self.preset,
+            self.global_settings,
+            bad_words=self.bad_words,
+            biases=self.bias_groups,
+            prefix=self.module,
+            stop_sequences=self._stop_ids
+        )
+        
+        # Decode response
+        tokens = NovelAIProvider.b64_to_tokens(
+            response["output"],
+            self.model_config['bytes_per_token']
+        )
+        return NovelAIProvider.Tokenizer.decode(self.model_enum, tokens)
+    
+    async def _agenerate_batch(self, prompts: List[str], system_prompt: Optional[str] = None,
+                               result_callback: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """Run agenerate() for every prompt over one API session.
+        
+        Args:
+            prompts: Prompt texts to generate from
+            system_prompt: Optional system instructions shared by all prompts
+            result_callback: Optional callable receiving (index, text) as
+                           each response completes
             
-            # Decode response
-            tokens = NovelAIProvider.b64_to_tokens(
-                response["output"],
-                self.model_config['bytes_per_token']
-            )
-            return NovelAIProvider.Tokenizer.decode(self.model_config['model'], tokens)
+        Returns:
+            Generated text responses, in the same order as prompts (empty
+            when result_callback is given)
+        """
+        # Log in before fanning out so concurrent requests share one session
+        try:
+            await self._enter_api()
+        except Exception as e:
+            raise Exception(f"NovelAI API error: {str(e)}")
+        return await super()._agenerate_batch(prompts, system_prompt, result_callback)
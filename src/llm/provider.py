@@ -4,13 +4,87 @@ This module defines the base LLM provider interface and implements provider-spec
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Optional, Union, List, Callable, Awaitable
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import os
+from types import MappingProxyType
 
-import tiktoken
-from openai import OpenAI
-import anthropic
-import google.generativeai as genai
+# Provider SDKs are imported on first use so only the selected provider pays
+# their import cost
+_tiktoken = None
+_openai = None
+_anthropic = None
+_genai = None
+_httpx = None
+
+def freeze_model_configs(configs: Dict[str, Dict[str, Any]]) -> Dict[str, MappingProxyType]:
+    """Wrap each model configuration in a read-only view.
+    
+    MODEL_CONFIGS is shared by every instance of a provider class, so each
+    provider takes a per-instance dict() copy of its entry before customizing
+    it. Nested dictionaries, such as tiered prices, are frozen as well and
+    stay read-only in that shallow copy.
+    
+    Args:
+        configs: Dictionary of model version -> model configuration
+        
+    Returns:
+        Dictionary of model version -> read-only model configuration
+    """
+    return {version: _freeze(config) for version, config in configs.items()}
+
+def _freeze(value: Any) -> Any:
+    """Recursively wrap dictionaries in read-only views.
+    
+    Args:
+        value: Configuration value
+        
+    Returns:
+        MappingProxyType for dictionaries, tuple for lists, value otherwise
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _http_limits() -> Any:
+    """Connection pool limits for the SDK HTTP clients.
+    
+    Pool sizes match the SDK defaults; only the keep-alive expiry is raised
+    from httpx's 5 seconds, so idle connections survive the gap between
+    generate() calls and later chunks skip a TCP/TLS handshake.
+    
+    Returns:
+        httpx.Limits for the provider clients
+    """
+    return _httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=60)
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(model_name: str) -> Any:
+    """Get the tiktoken encoding for a model, loading each BPE table once.
+    
+    Args:
+        model_name: OpenAI model name
+        
+    Returns:
+        tiktoken Encoding for the model
+    """
+    return _tiktoken.encoding_for_model(model_name)
+
+@functools.lru_cache(maxsize=8)
+def _get_gemini_model(model_name: str) -> Any:
+    """Get a Gemini GenerativeModel, built once per model name.
+    
+    Args:
+        model_name: Gemini model name
+        
+    Returns:
+        genai.GenerativeModel for the model
+    """
+    return _genai.GenerativeModel(model_name)
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
@@ -26,6 +100,10 @@ class LLMProvider(ABC):
         self.model = config.get('model')
         self.temperature = config.get('temperature', 0.7)
         self.max_tokens = config.get('max_input_tokens', 128000)
+        
+        # Maximum number of requests generate_batch() keeps in flight at once
+        self.batch_concurrency = config.get('batch_concurrency', 4)
+        self._runner = None
     
     @abstractmethod
     def count_tokens(self, text: str) -> int:
@@ -39,19 +117,142 @@ class LLMProvider(ABC):
         """
         pass
     
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count the number of tokens in each of several texts.
+        
+        Args:
+            texts: Input texts to count tokens for
+            
+        Returns:
+            Number of tokens in each text, in the same order as texts
+        """
+        # Most providers count tokens over the network, so count concurrently
+        with ThreadPoolExecutor() as executor:
+            return list(executor.map(self.count_tokens, texts))
+    
     @abstractmethod
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                 stream_callback: Optional[Callable[[str], None]] = None) -> str:
         """Generate text using the LLM.
         
         Args:
             prompt: The main prompt text
             system_prompt: Optional system prompt for models that support it
+            stream_callback: Optional callable receiving the output text as it
+                arrives; providers without streaming call it once with the
+                full response
             
         Returns:
             Generated text response
         """
         pass
     
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Generate text using the LLM without blocking the event loop.
+        
+        Providers with an async client override this; the default runs
+        generate() in a worker thread.
+        
+        Args:
+            prompt: The main prompt text
+            system_prompt: Optional system prompt for models that support it
+            
+        Returns:
+            Generated text response
+        """
+        return await asyncio.to_thread(self.generate, prompt, system_prompt)
+    
+    def generate_batch(self, prompts: List[str], system_prompt: Optional[str] = None,
+                       result_callback: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """Generate text for several independent prompts concurrently.
+        
+        Requests are issued through agenerate(), at most batch_concurrency
+        at a time, so total latency approaches that of the slowest request
+        rather than the sum of all of them. If any request fails, the
+        remaining ones are cancelled and the error is raised.
+        
+        Args:
+            prompts: Prompt texts to generate from
+            system_prompt: Optional system prompt shared by all prompts
+            result_callback: Optional callable receiving (index, text) as
+                           each response completes, in completion order;
+                           responses are then not kept
+            
+        Returns:
+            Generated text responses, in the same order as prompts (empty
+            when result_callback is given)
+            
+        Raises:
+            Exception: If any of the API calls fails
+        """
+        return self._run(self._agenerate_batch(prompts, system_prompt, result_callback))
+    
+    def close(self) -> None:
+        """Release resources held by the provider."""
+        if self._runner is not None:
+            self._runner.close()
+            self._runner = None
+    
+    def _run(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine on the provider's event loop.
+        
+        The loop is created on first use and kept, so async clients can keep
+        their connections between calls.
+        
+        Args:
+            coro: Coroutine to run
+            
+        Returns:
+            Result of the coroutine
+        """
+        if self._runner is None:
+            self._runner = asyncio.Runner()
+        return self._runner.run(coro)
+    
+    async def _agenerate_batch(self, prompts: List[str], system_prompt: Optional[str] = None,
+                               result_callback: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """Run agenerate() for every prompt, at most batch_concurrency at a time.
+        
+        Args:
+            prompts: Prompt texts to generate from
+            system_prompt: Optional system prompt shared by all prompts
+            result_callback: Optional callable receiving (index, text) as
+                           each response completes
+            
+        Returns:
+            Generated text responses, in the same order as prompts (empty
+            when result_callback is given)
+            
+        Raises:
+            Exception: The first error raised by a request
+        """
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        results: List[Optional[str]] = [None] * len(prompts)
+        
+        async def bounded(index: int, prompt: str) -> None:
+            async with semaphore:
+                text = await self.agenerate(prompt, system_prompt)
+            if result_callback:
+                result_callback(index, text)
+            else:
+                results[index] = text
+        
+        tasks = [asyncio.create_task(bounded(i, prompt)) for i, prompt in enumerate(prompts)]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        
+        # On the first failure, cancel the requests still in flight instead
+        # of letting them run (and bill) for a batch that is already lost
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                raise task.exception()
+        
+        return [] if result_callback else results
+    
     def calculate_cost(self, input_tokens: int, output_tokens: int) -> Dict[str, float]:
         """Calculate cost for token usage.
         
@@ -67,7 +268,7 @@ class LLMProvider(ABC):
 class OpenAIProvider(LLMProvider):
     """OpenAI-specific LLM provider implementation."""
     
-    MODEL_CONFIGS = {
+    MODEL_CONFIGS = freeze_model_configs({
         "gpt-4o": {
             "model": "gpt-4o-2024-08-06",
             "max_input_tokens": 128000,
@@ -82,7 +283,7 @@ class OpenAIProvider(LLMProvider):
             "input_price": 0.00015,  # $0.15 per 1M tokens
             "output_price": 0.0006   # $0.60 per 1M tokens
         }
-    }
+    })
     
     def __init__(self, config: Dict[str, Any]):
         """Initialize OpenAI provider.
@@ -98,16 +299,54 @@ class OpenAIProvider(LLMProvider):
         if model_version not in self.MODEL_CONFIGS:
             raise ValueError(f"Invalid model version: {model_version}. Must be one of {list(self.MODEL_CONFIGS.keys())}")
             
-        model_config = self.MODEL_CONFIGS[model_version]
+        model_config = dict(self.MODEL_CONFIGS[model_version])
         
         # Update config with model-specific settings
         config['model'] = model_config['model']
         config['max_input_tokens'] = model_config['max_input_tokens']
         
         super().__init__(config)
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.encoding = tiktoken.encoding_for_model(self.model)
+        
+        global _openai, _tiktoken, _httpx
+        if _openai is None:
+            import openai as _openai
+            import tiktoken as _tiktoken
+            import httpx as _httpx
+        
+        # The SDK's default httpx clients, with only the pool limits changed
+        self.client = _openai.OpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            http_client=_openai.DefaultHttpxClient(limits=_http_limits())
+        )
+        # Created on first async use so close() never starts the event loop
+        # just to close a client that was never used
+        self._async_client = None
+        self._clients_open = True
+        self.encoding = _get_encoding(self.model)
         self.model_config = model_config
+        
+        # System messages keyed by prompt text; narratives reuse one system
+        # prompt for every chunk
+        self._system_msg_cache: Dict[str, Dict[str, str]] = {}
+    
+    @property
+    def async_client(self):
+        """The async client, created on first access."""
+        if self._async_client is None:
+            self._async_client = _openai.AsyncOpenAI(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                http_client=_openai.DefaultAsyncHttpxClient(limits=_http_limits())
+            )
+        return self._async_client
+    
+    def close(self) -> None:
+        """Close the HTTP clients and the provider's event loop."""
+        if self._clients_open:
+            self._clients_open = False
+            self.client.close()
+            if self._async_client is not None:
+                self._run(self._async_client.close())
+        super().close()
     
     def count_tokens(self, text: str) -> int:
         """Count tokens using tiktoken for OpenAI models.
@@ -120,6 +359,17 @@ class OpenAIProvider(LLMProvider):
         """
         return len(self.encoding.encode(text))
     
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for several texts in one tiktoken batch call.
+        
+        Args:
+            texts: Input texts to count tokens for
+            
+        Returns:
+            Number of tokens in each text, in the same order as texts
+        """
+        return [len(ids) for ids in self.encoding.encode_batch(texts, num_threads=os.cpu_count())]
+    
     def calculate_cost(self, input_tokens: int, output_tokens: int) -> Dict[str, float]:
         """Calculate cost for OpenAI token usage.
         
@@ -140,12 +390,14 @@ class OpenAIProvider(LLMProvider):
             'total_cost': total_cost
         }
     
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                 stream_callback: Optional[Callable[[str], None]] = None) -> str:
         """Generate text using OpenAI's chat completion API.
         
         Args:
             prompt: The main prompt text
             system_prompt: Optional system instructions
+            stream_callback: Optional callable receiving the output text as it arrives
             
         Returns:
             Generated text response
@@ -153,43 +405,80 @@ class OpenAIProvider(LLMProvider):
         Raises:
             Exception: If the API call fails
         """
-        messages = []
-        
-        if system_prompt:
-            messages.append({
-                "role": "system",
-                "content": system_prompt
-            })
-            
-        messages.append({
-            "role": "user",
-            "content": prompt
-        })
+        messages = self._build_messages(prompt, system_prompt)
         
         try:
-            # Count input tokens
-            input_text = "\n".join([m["content"] for m in messages])
-            input_tokens = self.count_tokens(input_text)
-            
-            # Make API call
+            # Stream the completion so output can be consumed as it arrives
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=self.temperature,
-                max_tokens=self.model_config['max_output_tokens']
+                max_tokens=self.model_config['max_output_tokens'],
+                stream=True
             )
             
-            # Count output tokens and calculate cost
-            output_text = response.choices[0].message.content
-            return output_text
+            chunks = []
+            for event in response:
+                if not event.choices:
+                    continue
+                delta = event.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    if stream_callback:
+                        stream_callback(delta)
+            return "".join(chunks)
+            
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+    
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Generate text using OpenAI's async chat completion API.
+        
+        Args:
+            prompt: The main prompt text
+            system_prompt: Optional system instructions
+            
+        Returns:
+            Generated text response
+            
+        Raises:
+            Exception: If the API call fails
+        """
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self._build_messages(prompt, system_prompt),
+                temperature=self.temperature,
+                max_tokens=self.model_config['max_output_tokens']
+            )
+            return response.choices[0].message.content
             
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
+    
+    def _build_messages(self, prompt: str, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """Build the chat messages for a request.
+        
+        Args:
+            prompt: The main prompt text
+            system_prompt: Optional system instructions
+            
+        Returns:
+            List of chat messages
+        """
+        user_msg = {"role": "user", "content": prompt}
+        if not system_prompt:
+            return [user_msg]
+        
+        sys_msg = self._system_msg_cache.get(system_prompt)
+        if sys_msg is None:
+            sys_msg = self._system_msg_cache[system_prompt] = {"role": "system", "content": system_prompt}
+        return [sys_msg, user_msg]
 
 class AnthropicProvider(LLMProvider):
     """Anthropic-specific LLM provider implementation."""
     
-    MODEL_CONFIGS = {
+    MODEL_CONFIGS = freeze_model_configs({
         "claude-3-opus-latest": {
             "model": "claude-3-opus-20240229",
             "max_input_tokens": 200000,
@@ -211,7 +500,7 @@ class AnthropicProvider(LLMProvider):
             "input_price": 0.0008,   # $0.80 per 1M tokens
             "output_price": 0.004    # $4.00 per 1M tokens
         }
-    }
+    })
     
     def __init__(self, config: Dict[str, Any]):
         """Initialize Anthropic provider.
@@ -226,15 +515,46 @@ class AnthropicProvider(LLMProvider):
         if model_version not in self.MODEL_CONFIGS:
             raise ValueError(f"Invalid model version: {model_version}. Must be one of {list(self.MODEL_CONFIGS.keys())}")
             
-        model_config = self.MODEL_CONFIGS[model_version]
+        model_config = dict(self.MODEL_CONFIGS[model_version])
         
         config['model'] = model_config['model']
         config['max_input_tokens'] = model_config['max_input_tokens']
         
         super().__init__(config)
-        self.client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+        
+        global _anthropic, _httpx
+        if _anthropic is None:
+            import anthropic as _anthropic
+            import httpx as _httpx
+        
+        # The SDK's default httpx clients, with only the pool limits changed
+        self.client = _anthropic.Anthropic(
+            api_key=os.getenv('ANTHROPIC_API_KEY'),
+            http_client=_anthropic.DefaultHttpxClient(limits=_http_limits())
+        )
+        self._async_client = None
+        self._clients_open = True
         self.model_config = model_config
     
+    @property
+    def async_client(self):
+        """The async client, created on first access."""
+        if self._async_client is None:
+            self._async_client = _anthropic.AsyncAnthropic(
+                api_key=os.getenv('ANTHROPIC_API_KEY'),
+                http_client=_anthropic.DefaultAsyncHttpxClient(limits=_http_limits())
+            )
+        return self._async_client
+    
+    def close(self) -> None:
+        """Close the HTTP clients and the provider's event loop."""
+        if self._clients_open:
+            self._clients_open = False
+            self.client.close()
+            if self._async_client is not None:
+                self._run(self._async_client.close())
+        super().close()
+    
     def count_tokens(self, text: str) -> int:
         """Count tokens using Anthropic's token counter.
         
@@ -266,12 +586,14 @@ class AnthropicProvider(LLMProvider):
             'total_cost': total_cost
         }
     
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                 stream_callback: Optional[Callable[[str], None]] = None) -> str:
         """Generate text using Anthropic's API.
         
         Args:
             prompt: The main prompt text
             system_prompt: Optional system instructions
+            stream_callback: Optional callable receiving the output text as it arrives
             
         Returns:
             Generated text response
@@ -280,35 +602,70 @@ class AnthropicProvider(LLMProvider):
             Exception: If the API call fails
         """
         try:
-            # Count input tokens
-            input_text = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
-            input_tokens = self.count_tokens(input_text)
-            
             # Make API call
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.model_config['max_output_tokens'],
-                temperature=self.temperature,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            message = self.client.messages.create(**self._build_request(prompt, system_prompt))
             
             # Get output text
             output_text = message.content[0].text
+            if stream_callback:
+                stream_callback(output_text)
             return output_text
             
         except Exception as e:
             raise Exception(f"Anthropic API error: {str(e)}")
+    
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Generate text using Anthropic's async API.
+        
+        Args:
+            prompt: The main prompt text
+            system_prompt: Optional system instructions
+            
+        Returns:
+            Generated text response
+            
+        Raises:
+            Exception: If the API call fails
+        """
+        try:
+            message = await self.async_client.messages.create(**self._build_request(prompt, system_prompt))
+            return message.content[0].text
+            
+        except Exception as e:
+            raise Exception(f"Anthropic API error: {str(e)}")
+    
+    def _build_request(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Build the Messages API arguments for a request.
+        
+        Args:
+            prompt: The main prompt text
+            system_prompt: Optional system instructions
+            
+        Returns:
+            Keyword arguments for messages.create
+        """
+        request = {
+            "model": self.model,
+            "max_tokens": self.model_config['max_output_tokens'],
+            "temperature": self.temperature,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+        # No cache_control breakpoint: Anthropic only caches prefixes of at
+        # least 1024 tokens (2048 for Haiku), and the system prompt shared by
+        # every chunk is far shorter
+        if system_prompt:
+            request["system"] = system_prompt
+        return request
 
 class GeminiProvider(LLMProvider):
     """Google's Gemini-specific LLM provider implementation."""
     
-    MODEL_CONFIGS = {
+    MODEL_CONFIGS = freeze_model_configs({
         "gemini-2.0-flash": {
             "model": "gemini-2.0-flash",
             "max_input_tokens": 1000000,  # 1M token context
@@ -342,7 +699,7 @@ class GeminiProvider(LLMProvider):
                 "extended": 0.01       # $10.00 per 1M tokens (>128k)
             }
         }
-    }
+    })
     
     def __init__(self, config: Dict[str, Any]):
         """Initialize Gemini provider.
@@ -357,14 +714,19 @@ class GeminiProvider(LLMProvider):
         if model_version not in self.MODEL_CONFIGS:
             raise ValueError(f"Invalid model version: {model_version}. Must be one of {list(self.MODEL_CONFIGS.keys())}")
             
-        model_config = self.MODEL_CONFIGS[model_version]
+        model_config = dict(self.MODEL_CONFIGS[model_version])
         
         config['model'] = model_config['model']
         config['max_input_tokens'] = model_config['max_input_tokens']
         
         super().__init__(config)
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel(model_config['model'])
+        
+        global _genai
+        if _genai is None:
+            import google.generativeai as _genai
+        
+        _genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+        self.model = _get_gemini_model(model_config['model'])
         self.model_config = model_config
     
     def count_tokens(self, text: str) -> int:
@@ -415,12 +777,14 @@ class GeminiProvider(LLMProvider):
             'total_cost': total_cost
         }
     
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                 stream_callback: Optional[Callable[[str], None]] = None) -> str:
         """Generate text using Gemini's API.
         
         Args:
             prompt: The main prompt text
             system_prompt: Optional system instructions
+            stream_callback: Optional callable receiving the output text as it arrives
             
         Returns:
             Generated text response
@@ -429,14 +793,12 @@ class GeminiProvider(LLMProvider):
             Exception: If the API call fails
         """
         try:
-            # Count input tokens
             input_text = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
-            input_tokens = self.count_tokens(input_text)
             
             # Make API call
             response = self.model.generate_content(
                 input_text,
-                generation_config=genai.types.GenerationConfig(
+                generation_config=_genai.types.GenerationConfig(
                     temperature=self.temperature,
                     max_output_tokens=self.model_config['max_output_tokens']
                 )
@@ -444,9 +806,38 @@ class GeminiProvider(LLMProvider):
             
             # Get output text
             output_text = response.text
+            if stream_callback:
+                stream_callback(output_text)
             return output_text
             
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
+    
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Generate text using Gemini's async API.
+        
+        Args:
+            prompt: The main prompt text
+            system_prompt: Optional system instructions
+            
+        Returns:
+            Generated text response
+            
+        Raises:
+            Exception: If the API call fails
+        """
+        try:
+            input_text = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+            response = await self.model.generate_content_async(
+                input_text,
+                generation_config=_genai.types.GenerationConfig(
+                    temperature=self.temperature,
+                    max_output_tokens=self.model_config['max_output_tokens']
+                )
+            )
+            return response.text
+            
+        except Exception as e:
+            raise Exception(f"Gemini API error: {str(e)}")
 
 # Provider registration moved to providers.py
@@ -3,14 +3,14 @@
 This module registers all available LLM providers.
 """
 
-from .provider import OpenAIProvider, AnthropicProvider, GeminiProvider
-from .novelai_provider import NovelAIProvider
+import importlib
 
+# Provider name -> (module, class name); modules are imported on first use
 PROVIDERS = {
-    'openai': OpenAIProvider,
-    'anthropic': AnthropicProvider,
-    'gemini': GeminiProvider,
-    'novelai': NovelAIProvider
+    'openai': ('.provider', 'OpenAIProvider'),
+    'anthropic': ('.provider', 'AnthropicProvider'),
+    'gemini': ('.provider', 'GeminiProvider'),
+    'novelai': ('.novelai_provider', 'NovelAIProvider')
 }
 
 def get_provider(config: dict) -> 'LLMProvider':
@@ -28,6 +28,8 @@ def get_provider(config: dict) -> 'LLMProvider':
     provider_name = config.get('provider', '').lower()
     
     if provider_name in PROVIDERS:
-        return PROVIDERS[provider_name](config)
+        module_name, class_name = PROVIDERS[provider_name]
+        module = importlib.import_module(module_name, __package__)
+        return getattr(module, class_name)(config)
     else:
         raise ValueError(f"Unsupported provider: {provider_name}")
@@ -3,27 +3,84 @@
 This module provides utilities for token counting and text chunking based on token limits.
 """
 
-from typing import List, Dict, Any
-import json
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+import threading
 
+from .provider import LLMProvider
 from .providers import get_provider
 
+if TYPE_CHECKING:
+    from ..processor.conversation import Conversation
+
+# Texts longer than this are counted directly rather than kept in the cache
+_MAX_CACHED_TEXT_LENGTH = 1_000_000
+
+# Number of texts whose token counts are kept, least recently used evicted first
+_TOKEN_CACHE_SIZE = 10_000
+
+# Rough characters-per-token ratio for English text, used by fast_fits()
+_CHARS_PER_TOKEN = 3.5
+
+# Fraction of the context window available for conversation input
+_CONTEXT_FRACTION = 0.8
+
+# Chat formatting tokens added per exchange (OpenAI chat format constant)
+_PER_MSG_OVERHEAD = 4
+
+def _is_ascii(conversation: 'Conversation') -> bool:
+    """Check whether every prompt and response is ASCII text.
+    
+    Args:
+        conversation: Conversation to check
+        
+    Returns:
+        True if all text in the conversation is ASCII
+    """
+    return all(text.isascii() for text in conversation.prompts) and all(text.isascii() for text in conversation.responses)
+
 class TokenCounter:
     """Handles token counting and text chunking."""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], provider: Optional[LLMProvider] = None):
         """Initialize TokenCounter with LLM provider.
         
         Args:
             config: LLM configuration dictionary
+            provider: Existing provider to count with; one is created from
+                     config if not given
         """
-        self.provider = get_provider(config)
+        self.provider = provider if provider is not None else get_provider(config)
         self.max_tokens = config.get('max_input_tokens', 128000)
+        # Input token budget, leaving room for system prompt and generation
+        self.effective_limit = int(self.max_tokens * _CONTEXT_FRACTION)
+        
+        # Whole-string token count cache; system prompts and repeated context
+        # are counted many times over a run. Guarded by a lock since prompts
+        # are counted from a prefetch thread while the main thread counts output
+        self._tok_cache: "OrderedDict[str, int]" = OrderedDict()
+        self._tok_cache_lock = threading.Lock()
+        self._tok_cache_hits = 0
+        self._tok_cache_misses = 0
+        
+        # Token counts per exchange, keyed on (prompt, response), so recounting
+        # a conversation only tokenizes exchanges not seen before
+        self._exchange_tokens: Dict[Tuple[str, str], int] = {}
+        
+        # Running total for the conversation counted last, with the exchanges
+        # it covers; recounting that conversation, or one that extends it,
+        # only adds the token deltas of the new exchanges
+        self._counted_prompts: List[str] = []
+        self._counted_responses: List[str] = []
+        self._prompt_tokens_so_far = 0
         
         # Track cumulative token usage
         self.total_input_tokens = 0
         self.total_output_tokens = 0
+        self.total_tokens = 0
         self.total_cost = 0.0
+        # Subscription description for providers without per-token pricing
+        self._subscription: Optional[str] = None
         
         # Track context window usage
         self.max_context_used = 0
@@ -36,18 +93,21 @@ class TokenCounter:
             input_tokens: Number of input tokens used
             output_tokens: Number of output tokens used
         """
+        chunk_total = input_tokens + output_tokens
         self.total_input_tokens += input_tokens
         self.total_output_tokens += output_tokens
+        self.total_tokens += chunk_total
         
         # Update context window tracking
-        chunk_total = input_tokens + output_tokens
         if chunk_total > self.max_context_used:
             self.max_context_used = chunk_total
-            self.max_context_chunk = self.total_input_tokens + self.total_output_tokens
+            self.max_context_chunk = self.total_tokens
         
         # Calculate cost if not subscription-based
         costs = self.provider.calculate_cost(input_tokens, output_tokens)
-        if 'subscription' not in costs:
+        if 'subscription' in costs:
+            self._subscription = costs['subscription']
+        else:
             self.total_cost += costs['total_cost']
             
         # Return current chunk stats
@@ -67,17 +127,11 @@ class TokenCounter:
         Returns:
             Dictionary with running totals and context info
         """
-        total_tokens = self.total_input_tokens + self.total_output_tokens
-        costs = self.provider.calculate_cost(
-            self.total_input_tokens,
-            self.total_output_tokens
-        )
-        
         return {
             'input_tokens': self.total_input_tokens,
             'output_tokens': self.total_output_tokens,
-            'total_tokens': total_tokens,
-            'cost': costs.get('subscription', f"${self.total_cost:.4f}"),
+            'total_tokens': self.total_tokens,
+            'cost': self._subscription or f"${self.total_cost:.4f}",
             'context_info': {
                 'max_used': self.max_context_used,
                 'max_allowed': self.max_tokens,
@@ -86,19 +140,41 @@ class TokenCounter:
             }
         }
     
-    def count_conversation_tokens(self, conversation: List[Dict[str, str]]) -> int:
+    def count_conversation_tokens(self, conversation: 'Conversation') -> int:
         """Count tokens in a conversation.
         
         Args:
-            conversation: List of conversation exchanges
-                        [{"prompt": "...", "response": "..."}, ...]
+            conversation: Conversation to count
             
         Returns:
             Total number of tokens in the conversation
         """
-        # Convert conversation to string for token counting
-        conversation_text = json.dumps(conversation)
-        return self.provider.count_tokens(conversation_text)
+        # Reuse the running total when the conversation starts with the
+        # exchanges it covers
+        counted = len(self._counted_prompts)
+        if (counted <= len(conversation) and
+                conversation.prompts[:counted] == self._counted_prompts and
+                conversation.responses[:counted] == self._counted_responses):
+            total = self._prompt_tokens_so_far
+        else:
+            counted, total = 0, 0
+        
+        for key in zip(conversation.prompts[counted:], conversation.responses[counted:]):
+            tokens = self._exchange_tokens.get(key)
+            if tokens is None:
+                # Count the raw texts; JSON quoting and escapes would inflate the count
+                prompt, response = key
+                tokens = self._exchange_tokens[key] = (
+                    self._count(prompt) +
+                    self._count(response) +
+                    _PER_MSG_OVERHEAD
+                )
+            total += tokens
+        
+        self._counted_prompts = list(conversation.prompts)
+        self._counted_responses = list(conversation.responses)
+        self._prompt_tokens_so_far = total
+        return total
     
     def estimate_chunks_needed(self, total_tokens: int) -> int:
         """Estimate number of chunks needed based on token count.
@@ -109,9 +185,29 @@ class TokenCounter:
         Returns:
             Number of chunks needed
         """
-        # Leave room for system prompt and generation
-        effective_limit = int(self.max_tokens * 0.8)
-        return (total_tokens + effective_limit - 1) // effective_limit
+        return (total_tokens + self.effective_limit - 1) // self.effective_limit
+    
+    def fast_fits(self, conversation: 'Conversation') -> Optional[bool]:
+        """Estimate from character counts whether a conversation fits in context.
+        
+        Args:
+            conversation: Conversation to check
+            
+        Returns:
+            True or False when the estimate is clearly under or over the
+            limit, None when it is too close to call without tokenizing
+        """
+        chars = sum(map(len, conversation.prompts)) + sum(map(len, conversation.responses))
+        approx_tokens = chars / _CHARS_PER_TOKEN
+        
+        if approx_tokens > self.effective_limit * 1.05:
+            return False
+        # The ratio only holds for Latin-script text; CJK and other scripts run
+        # closer to one character per token, so only ASCII text can be
+        # declared fitting without tokenizing
+        if approx_tokens < self.effective_limit * 0.9 and _is_ascii(conversation):
+            return True
+        return None
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text using provider's counter.
@@ -122,7 +218,35 @@ class TokenCounter:
         Returns:
             Number of tokens in the text
         """
-        return self.provider.count_tokens(text)
+        return self._count(text)
+    
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens in several texts with one provider batch call.
+        
+        Texts already in the token count cache are not sent to the provider;
+        the counts of the others are added to the cache.
+        
+        Args:
+            texts: Texts to count tokens for
+            
+        Returns:
+            Number of tokens in each text, in the same order as texts
+        """
+        counts: Dict[str, int] = {}
+        misses: List[str] = []
+        for text in dict.fromkeys(texts):
+            count = self._cache_get(text)
+            if count is None:
+                misses.append(text)
+            else:
+                counts[text] = count
+        
+        if misses:
+            for text, count in zip(misses, self.provider.count_tokens_batch(misses)):
+                counts[text] = count
+                self._cache_put(text, count)
+        
+        return [counts[text] for text in texts]
     
     def will_fit_in_context(self, text: str) -> bool:
         """Check if text will fit within token limit.
@@ -133,6 +257,69 @@ class TokenCounter:
         Returns:
             True if text fits within token limit, False otherwise
         """
-        token_count = self.provider.count_tokens(text)
-        # Leave room for system prompt and generation
-        return token_count <= int(self.max_tokens * 0.8)
+        token_count = self._count(text)
+        return token_count <= self.effective_limit
+    
+    def cache_info(self) -> Any:
+        """Get statistics for the token count cache.
+        
+        Returns:
+            Dictionary with hits, misses, maxsize and currsize
+        """
+        with self._tok_cache_lock:
+            return {
+                'hits': self._tok_cache_hits,
+                'misses': self._tok_cache_misses,
+                'maxsize': _TOKEN_CACHE_SIZE,
+                'currsize': len(self._tok_cache)
+            }
+    
+    def _count(self, text: str) -> int:
+        """Count tokens through the cache, bypassing it for very large texts.
+        
+        Args:
+            text: Text to count tokens for
+            
+        Returns:
+            Number of tokens in the text
+        """
+        count = self._cache_get(text)
+        if count is None:
+            count = self.provider.count_tokens(text)
+            self._cache_put(text, count)
+        return count
+    
+    def _cache_get(self, text: str) -> Optional[int]:
+        """Look up a cached token count.
+        
+        Args:
+            text: Text to look up
+            
+        Returns:
+            Cached number of tokens, or None if the text is not cached
+        """
+        if len(text) > _MAX_CACHED_TEXT_LENGTH:
+            return None
+        with self._tok_cache_lock:
+            count = self._tok_cache.get(text)
+            if count is None:
+                self._tok_cache_misses += 1
+            else:
+                self._tok_cache_hits += 1
+                self._tok_cache.move_to_end(text)
+            return count
+    
+    def _cache_put(self, text: str, count: int) -> None:
+        """Store a token count, evicting the least recently used entry if full.
+        
+        Args:
+            text: Text that was counted
+            count: Number of tokens in the text
+        """
+        if len(text) > _MAX_CACHED_TEXT_LENGTH:
+            return
+        with self._tok_cache_lock:
+            self._tok_cache[text] = count
+            self._tok_cache.move_to_end(text)
+            if len(self._tok_cache) > _TOKEN_CACHE_SIZE:
+                self._tok_cache.popitem(last=False)
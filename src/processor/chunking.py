@@ -3,9 +3,90 @@
 This module handles the chunking of conversations into manageable segments while preserving context.
 """
 
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, TYPE_CHECKING
+import bisect
 import re
 
+if TYPE_CHECKING:
+    from .conversation import Conversation
+
+# hyperscan is optional; without it scene detection uses the re pattern below
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Common scene change indicators; groups are non-capturing so matches carry
+# no group state
+_SCENE_INDICATORS = [
+    r"later",
+    r"the next day",
+    r"after [^.]{0,80}",
+    r"suddenly",
+    r"meanwhile",
+    r"elsewhere",
+    r"hours? (?:later|passed)",
+    r"days? (?:later|passed)",
+    r"the following",
+    r"that (?:evening|morning|afternoon|night)",
+]
+
+_SCENE_PATTERN = re.compile('|'.join(f"\\b{i}\\b" for i in _SCENE_INDICATORS), re.IGNORECASE)
+
+def _compile_scene_database() -> Any:
+    """Compile the scene change indicators into a Hyperscan database.
+    
+    Hyperscan's \\b is an ASCII word boundary and it has no Unicode-aware
+    \\b, so the database is only used for ASCII text; see _scan().
+    
+    Returns:
+        Hyperscan block-mode database, or None if hyperscan is unavailable
+    """
+    if hyperscan is None:
+        return None
+    
+    expressions = [f"\\b{i}\\b".encode('ascii') for i in _SCENE_INDICATORS]
+    database = hyperscan.Database()
+    database.compile(
+        expressions=expressions,
+        ids=list(range(len(expressions))),
+        elements=len(expressions),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions)
+    )
+    return database
+
+_SCENE_DATABASE = _compile_scene_database()
+
+# Joins exchanges for whole-conversation scans. It holds no word characters,
+# so word boundaries still hold at exchange edges, and the '.' keeps
+# 'after ...' from running on into the next exchange
+_EXCHANGE_SEPARATOR = '.\n'
+
+def _scan(text: str) -> bool:
+    """Check text for any scene change indicator.
+    
+    Args:
+        text: Text to scan
+        
+    Returns:
+        True if an indicator is found
+    """
+    # Non-ASCII text goes to re, whose word boundaries are Unicode-aware
+    if _SCENE_DATABASE is None or not text.isascii():
+        return _SCENE_PATTERN.search(text) is not None
+    
+    matches = []
+    
+    def on_match(pattern_id, start, end, flags, context):
+        matches.append(pattern_id)
+        return True  # Stop scanning at the first indicator
+    
+    try:
+        _SCENE_DATABASE.scan(text.encode('ascii'), match_event_handler=on_match)
+    except hyperscan.ScanTerminated:
+        pass
+    return bool(matches)
+
 class ConversationChunker:
     """Handles chunking of conversations into processable segments."""
     
@@ -17,56 +98,71 @@ class ConversationChunker:
         """
         self.split_on_scenes = config.get('processing', {}).get('split_on_scene_changes', True)
         self.context_exchanges = config.get('processing', {}).get('context_exchanges', 2)
+        # Scene cuts closer together than this are ignored; values below 1
+        # mean no minimum
+        self.min_exchanges = max(1, config.get('processing', {}).get('min_chunk_exchanges', 4))
     
-    def detect_scene_change(self, current: Dict[str, str], next_exchange: Dict[str, str]) -> bool:
-        """Detect if there's a significant scene change between exchanges.
+    def detect_scene_changes(self, conversation: 'Conversation') -> List[bool]:
+        """Flag every exchange that contains a scene change indicator.
+        
+        The re fallback scans the whole conversation as one string instead of
+        searching each exchange separately.
         
         Args:
-            current: Current conversation exchange
-            next_exchange: Next conversation exchange
+            conversation: Conversation to scan
             
         Returns:
-            True if a scene change is detected
+            List with one flag per exchange, True if it contains an indicator
         """
-        # Common scene change indicators
-        indicators = [
-            r"later",
-            r"the next day",
-            r"after [^.]*",
-            r"suddenly",
-            r"meanwhile",
-            r"elsewhere",
-            r"hours? (later|passed)",
-            r"days? (later|passed)",
-            r"the following",
-            r"that (evening|morning|afternoon|night)",
-        ]
-        
-        pattern = '|'.join(f"\\b{i}\\b" for i in indicators)
-        
-        # Check both prompt and response for scene change indicators
-        next_text = f"{next_exchange['prompt']} {next_exchange['response']}"
-        return bool(re.search(pattern, next_text, re.IGNORECASE))
+        texts = [f"{prompt} {response}" for prompt, response in zip(conversation.prompts, conversation.responses)]
+        if _SCENE_DATABASE is not None:
+            return [_scan(text) for text in texts]
+        
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(_EXCHANGE_SEPARATOR)
+        joined = _EXCHANGE_SEPARATOR.join(texts)
+        
+        flags = [False] * len(conversation)
+        match = _SCENE_PATTERN.search(joined)
+        while match:
+            index = bisect.bisect_right(starts, match.start()) - 1
+            flags[index] = True
+            if index + 1 >= len(starts):
+                break
+            # One hit is enough; resume at the next exchange
+            match = _SCENE_PATTERN.search(joined, starts[index + 1])
+        
+        return flags
     
-    def find_chunk_boundaries(self, conversation: List[Dict[str, str]]) -> List[Tuple[int, int]]:
+    def find_chunk_boundaries(self, conversation: 'Conversation') -> List[Tuple[int, int]]:
         """Find optimal chunk boundaries in the conversation.
         
         Args:
-            conversation: List of conversation exchanges
+            conversation: Conversation to chunk
             
         Returns:
             List of (start_idx, end_idx) tuples defining chunks
         """
         chunks = []
         current_start = 0
+        scene_changes = self.detect_scene_changes(conversation) if self.split_on_scenes else None
         
-        for i in range(1, len(conversation)):
-            # Check for scene changes if enabled
-            if self.split_on_scenes and i < len(conversation) - 1:
-                if self.detect_scene_change(conversation[i], conversation[i + 1]):
-                    chunks.append((current_start, i + 1))
-                    current_start = i + 1
-                    continue
+        # Check for scene changes if enabled; each chunk spans at least
+        # min_exchanges exchanges
+        i = max(1, self.min_exchanges - 1)
+        while scene_changes and i < len(conversation) - 1:
+            # Stop once the remaining tail is too short to split off
+            if len(conversation) - (i + 1) < self.min_exchanges:
+                break
+            if scene_changes[i + 1]:
+                chunks.append((current_start, i + 1))
+                current_start = i + 1
+                i += self.min_exchanges
+                continue
+            i += 1
         
         # Add the final chunk
         if current_start < len(conversation):
@@ -74,20 +170,20 @@ class ConversationChunker:
         
         return chunks
     
-    def get_context_for_chunk(self, conversation: List[Dict[str, str]], 
-                            start_idx: int, previous_chunk_end: int = None) -> List[Dict[str, str]]:
+    def get_context_for_chunk(self, conversation: 'Conversation', 
+                            start_idx: int, previous_chunk_end: int = None) -> 'Conversation':
         """Get relevant context exchanges for a chunk.
         
         Args:
-            conversation: Full conversation list
+            conversation: Full conversation
             start_idx: Start index of current chunk
             previous_chunk_end: End index of previous chunk
             
         Returns:
-            List of context exchanges
+            Context exchanges (empty for the first chunk)
         """
         if previous_chunk_end is None or start_idx == 0:
-            return []
+            return conversation[:0]
         
         # Get the specified number of exchanges before this chunk
         context_start = max(previous_chunk_end - self.context_exchanges, 0)
@@ -95,16 +191,16 @@ class ConversationChunker:
         
         return context
     
-    def chunk_conversation(self, conversation: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    def chunk_conversation(self, conversation: 'Conversation') -> List[Dict[str, Any]]:
         """Split conversation into chunks with context.
         
         Args:
-            conversation: List of conversation exchanges
+            conversation: Conversation to chunk
             
         Returns:
             List of chunks, each containing:
-                - exchanges: List of conversation exchanges for this chunk
-                - context: List of relevant context exchanges from previous chunk
+                - exchanges: Conversation exchanges for this chunk
+                - context: Relevant context exchanges from previous chunk
         """
         chunk_boundaries = self.find_chunk_boundaries(conversation)
         chunks = []
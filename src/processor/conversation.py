@@ -3,14 +3,124 @@
 This module handles the processing of conversations and generation of narratives.
 """
 
-from typing import List, Dict, Any
-import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Dict, Any, TextIO, Tuple, Union
 
 from ..llm.providers import get_provider
 from ..llm.token_counter import TokenCounter
 from ..utils.file_handler import FileHandler
 from .chunking import ConversationChunker
 
+_SYSTEM_PROMPT = """You are a skilled narrative writer converting roleplay conversations into engaging first-person stories.
+Your task is to maintain the character's voice and perspective while transforming dialogue and scene descriptions 
+into flowing narrative prose. Focus on showing rather than telling, and ensure all important details and emotional 
+moments are preserved."""
+
+# Fixed parts of the narrative prompt
+_HEADER = (
+    "Convert the following roleplay conversation into a first-person narrative story.\n"
+    "Maintain the character's perspective, emotions, and voice throughout the narrative.\n\n"
+)
+_CONTEXT_PREFIX = "Previous context:\n"
+_SCENE_PREFIX = "\n\nCurrent scene:\n"
+_GUIDELINES_PREFIX = (
+    "\n\nGuidelines:\n"
+    "1. Write in first-person perspective\n"
+    "2. Show don't tell - use descriptive language\n"
+    "3. Maintain the emotional depth and character voice\n"
+    "4. Include all important details from the conversation\n"
+    "5. Preserve the pacing and tension\n"
+)
+_START_FIRST = "6. Begin the story naturally\n"
+_START_CONT = "6. Continue the narrative seamlessly from the previous section\n"
+_END_LAST = "7. Conclude the story appropriately"
+_END_NEXT = "7. Lead naturally into the next section"
+
+# Written between the narratives of consecutive chunks
+_PART_SEPARATOR = "\n\n"
+
+@dataclass
+class Conversation:
+    """Conversation exchanges stored as parallel prompt and response lists."""
+    
+    prompts: List[str]
+    responses: List[str]
+    
+    @classmethod
+    def from_exchanges(cls, exchanges: Any) -> 'Conversation':
+        """Build a conversation from loaded JSON exchanges.
+        
+        Args:
+            exchanges: List of conversation exchanges
+                      [{"prompt": "...", "response": "..."}, ...]
+            
+        Returns:
+            Conversation holding the prompts and responses
+            
+        Raises:
+            ValueError: If the exchanges are not in the expected format
+        """
+        if not isinstance(exchanges, list):
+            raise ValueError("Invalid conversation format: expected list of exchanges")
+        try:
+            prompts = [exchange['prompt'] for exchange in exchanges]
+            responses = [exchange['response'] for exchange in exchanges]
+        except (KeyError, TypeError):
+            raise ValueError("Invalid conversation format: each exchange needs a prompt and a response")
+        return cls(prompts, responses)
+    
+    def __len__(self) -> int:
+        return len(self.prompts)
+    
+    def __getitem__(self, index: Union[int, slice]) -> Union[Tuple[str, str], 'Conversation']:
+        """Get one exchange as a (prompt, response) tuple, or a slice as a Conversation."""
+        if isinstance(index, slice):
+            return Conversation(self.prompts[index], self.responses[index])
+        return self.prompts[index], self.responses[index]
+
+def _append_exchanges(parts: List[str], exchanges: Conversation) -> None:
+    """Append formatted exchanges to a list of prompt parts.
+    
+    Args:
+        parts: Prompt parts to append to
+        exchanges: Conversation exchanges to format
+    """
+    for i, (prompt, response) in enumerate(zip(exchanges.prompts, exchanges.responses)):
+        if i:
+            parts.append("\n")
+        parts.extend(("Character: ", prompt, "\nScene: ", response, "\n"))
+
+class _OrderedPartWriter:
+    """Writes narrative parts to the output in chunk order as they complete.
+    
+    Parts that finish before an earlier chunk are held until it arrives.
+    """
+    
+    def __init__(self, output: TextIO):
+        """Initialize the writer.
+        
+        Args:
+            output: Text file to write the narrative to
+        """
+        self.output = output
+        self._pending: Dict[int, str] = {}
+        self._next_index = 0
+    
+    def add(self, index: int, narrative_part: str) -> None:
+        """Add a finished part and write out every part now in order.
+        
+        Args:
+            index: Chunk index of the part
+            narrative_part: Generated narrative text
+        """
+        self._pending[index] = narrative_part
+        while self._next_index in self._pending:
+            if self._next_index:
+                self.output.write(_PART_SEPARATOR)
+            self.output.write(self._pending.pop(self._next_index))
+            self._next_index += 1
+
 class ConversationProcessor:
     """Processes conversations and generates narratives."""
     
@@ -22,9 +132,24 @@ class ConversationProcessor:
         """
         self.config = config
         self.llm = get_provider(config['llm'])
-        self.token_counter = TokenCounter(config['llm'])
+        # Share the provider so its clients and connection pool are reused
+        self.token_counter = TokenCounter(config['llm'], provider=self.llm)
         self.chunker = ConversationChunker(config)
         
+        # The system prompt is sent with every chunk; its tokens are counted
+        # once, on first use, since counting may call the provider API
+        self._system_prompt = _SYSTEM_PROMPT
+        self._system_tokens = None
+        
+        # Chunk prompts are independent, so they can be generated concurrently
+        # through the provider's batch API; off by default since providers
+        # limit concurrent requests
+        self.batch_chunks = config.get('processing', {}).get('batch_chunks', False)
+        
+    def close(self) -> None:
+        """Release the provider's HTTP clients, sessions and event loop."""
+        self.llm.close()
+    
     def _create_narrative_prompt(self, chunk: Dict[str, Any], is_first_chunk: bool, is_last_chunk: bool) -> str:
         """Create a prompt for narrative generation.
         
@@ -36,47 +161,19 @@ class ConversationProcessor:
         Returns:
             Formatted prompt for the LLM
         """
-        # Format context and current exchanges
-        context_text = ""
+        parts = [_HEADER]
         if chunk['context']:
-            context_exchanges = [
-                f"Previous context:\n" +
-                "\n".join([
-                    f"Character: {exchange['prompt']}\n"
-                    f"Scene: {exchange['response']}\n"
-                    for exchange in chunk['context']
-                ])
-            ]
-            context_text = "\n".join(context_exchanges)
-        
-        current_exchanges = [
-            f"Character: {exchange['prompt']}\n"
-            f"Scene: {exchange['response']}\n"
-            for exchange in chunk['exchanges']
-        ]
-        
-        # Create the prompt
-        # Determine start and end instructions based on chunk position
-        start_instruction = "Begin the story naturally" if is_first_chunk else "Continue the narrative seamlessly from the previous section"
-        end_instruction = "Conclude the story appropriately" if is_last_chunk else "Lead naturally into the next section"
-        
-        prompt = (
-            f"Convert the following roleplay conversation into a first-person narrative story.\n"
-            f"Maintain the character's perspective, emotions, and voice throughout the narrative.\n\n"
-            f"{context_text}\n\n"
-            f"Current scene:\n"
-            f"{chr(10).join(current_exchanges)}\n\n"
-            f"Guidelines:\n"
-            f"1. Write in first-person perspective\n"
-            f"2. Show don't tell - use descriptive language\n"
-            f"3. Maintain the emotional depth and character voice\n"
-            f"4. Include all important details from the conversation\n"
-            f"5. Preserve the pacing and tension\n"
-            f"6. {start_instruction}\n"
-            f"7. {end_instruction}"
-        )
-
-        return prompt
+            parts.append(_CONTEXT_PREFIX)
+            _append_exchanges(parts, chunk['context'])
+        parts.append(_SCENE_PREFIX)
+        _append_exchanges(parts, chunk['exchanges'])
+        
+        # Start and end instructions depend on chunk position
+        parts.append(_GUIDELINES_PREFIX)
+        parts.append(_START_FIRST if is_first_chunk else _START_CONT)
+        parts.append(_END_LAST if is_last_chunk else _END_NEXT)
+        
+        return ''.join(parts)
     
     def _get_system_prompt(self) -> str:
         """Get the system prompt for narrative generation.
@@ -84,10 +181,62 @@ class ConversationProcessor:
         Returns:
             System prompt string
         """
-        return """You are a skilled narrative writer converting roleplay conversations into engaging first-person stories.
-Your task is to maintain the character's voice and perspective while transforming dialogue and scene descriptions 
-into flowing narrative prose. Focus on showing rather than telling, and ensure all important details and emotional 
-moments are preserved."""
+        return self._system_prompt
+    
+    def _get_system_tokens(self) -> int:
+        """Get the token count of the system prompt, counting it on first use.
+        
+        Returns:
+            Number of tokens in the system prompt
+        """
+        if self._system_tokens is None:
+            self._system_tokens = self.token_counter.count_tokens(self._system_prompt)
+        return self._system_tokens
+    
+    def _build_chunk_prompt(self, chunks: List[Dict[str, Any]], index: int) -> Tuple[str, int]:
+        """Build the narrative prompt for a chunk and count its tokens.
+        
+        Args:
+            chunks: All conversation chunks
+            index: Index of the chunk to build
+            
+        Returns:
+            Tuple of (prompt, input token count)
+        """
+        prompt = self._create_narrative_prompt(
+            chunks[index],
+            is_first_chunk=(index == 0),
+            is_last_chunk=(index == len(chunks) - 1)
+        )
+        return prompt, self.token_counter.count_tokens(prompt) + self._get_system_tokens()
+    
+    def _print_chunk_usage(self, usage: Dict[str, Any]) -> None:
+        """Print token usage for a processed chunk.
+        
+        Args:
+            usage: Usage stats returned by TokenCounter.add_usage
+        """
+        # Show chunk usage
+        chunk_stats = usage['chunk']
+        print(f"\nCurrent chunk:")
+        print(f"  Input:  {chunk_stats['input_tokens']:,} tokens")
+        print(f"  Output: {chunk_stats['output_tokens']:,} tokens")
+        print(f"  Total:  {chunk_stats['total_tokens']:,} tokens")
+        print(f"  Context: {chunk_stats['context_percent']:.1f}% of window")
+        
+        # Show running totals
+        running = usage['running']
+        context = running['context_info']
+        print(f"\nRunning totals:")
+        print(f"  Input:  {running['input_tokens']:,} tokens")
+        print(f"  Output: {running['output_tokens']:,} tokens")
+        print(f"  Total:  {running['total_tokens']:,} tokens")
+        print(f"  Cost:   {running['cost']}")
+        
+        # Warn if approaching context limits
+        if context['max_percent'] > 80:
+            print(f"\nWarning: Used {context['max_percent']:.1f}% of context window")
+            print(f"Peak usage: {context['max_used']:,} tokens at total token {context['at_tokens']:,}")
     
     def process_conversation(self, input_file: str, output_file: str) -> None:
         """Process a conversation file and generate a narrative.
@@ -101,86 +250,97 @@ moments are preserved."""
             ValueError: If conversation format is invalid
         """
         # Load conversation
-        conversation = FileHandler.load_json(input_file)
-        if not isinstance(conversation, list):
-            raise ValueError("Invalid conversation format: expected list of exchanges")
+        conversation = Conversation.from_exchanges(FileHandler.load_json(input_file))
         
-        # Check if conversation fits in one chunk
-        if self.token_counter.will_fit_in_context(json.dumps(conversation)):
-            # Process entire conversation at once
-            prompt = self._create_narrative_prompt(
-                {'exchanges': conversation, 'context': []},
-                is_first_chunk=True,
-                is_last_chunk=True
-            )
-            
-            # Count input tokens
-            input_tokens = self.token_counter.count_tokens(prompt)
-            
-            # Generate narrative
-            narrative = self.llm.generate(prompt, self._get_system_prompt())
-            
-            # Count output tokens and update totals
-            output_tokens = self.token_counter.count_tokens(narrative)
-            self.token_counter.add_usage(input_tokens, output_tokens)
-            
-            # Show usage
-            model_info = f"{self.config['llm'].get('provider', 'unknown').title()} {self.config['llm'].get('model_version', 'unknown')}"
-            usage = self.token_counter.get_cumulative_usage()
-            print(f"\nToken usage for {model_info}:")
-            print(f"  Input:  {usage['total_input_tokens']:,} tokens")
-            print(f"  Output: {usage['total_output_tokens']:,} tokens")
-            print(f"  Total:  {usage['total_tokens']:,} tokens")
-            print(f"  Cost:   {usage['cost']}")
-        else:
-            # Process chunks and track token usage
-            chunks = self.chunker.chunk_conversation(conversation)
-            narrative_parts = []
-            
-            model_info = f"{self.config['llm'].get('provider', 'unknown').title()} {self.config['llm'].get('model_version', 'unknown')}"
-            print(f"\nProcessing {len(chunks)} chunks using {model_info}:")
-            
-            # Process each chunk
-            for i, chunk in enumerate(chunks):
-                print(f"\nChunk {i+1}/{len(chunks)}...")
-                
-                # Count input tokens
+        # Check if conversation fits in one chunk, tokenizing only when the
+        # character estimate is too close to call
+        fits = self.token_counter.fast_fits(conversation)
+        if fits is None:
+            conversation_tokens = self.token_counter.count_conversation_tokens(conversation)
+            fits = conversation_tokens <= self.token_counter.effective_limit
+        
+        # Parts are written to the output file as they are generated
+        with FileHandler.open_narrative(output_file) as output:
+            if fits:
+                # Process entire conversation at once
                 prompt = self._create_narrative_prompt(
-                    chunk,
-                    is_first_chunk=(i == 0),
-                    is_last_chunk=(i == len(chunks) - 1)
+                    {'exchanges': conversation, 'context': conversation[:0]},
+                    is_first_chunk=True,
+                    is_last_chunk=True
                 )
-                input_tokens = self.token_counter.count_tokens(prompt)
+                
+                # Count input tokens
+                input_tokens = self.token_counter.count_tokens(prompt) + self._get_system_tokens()
                 
                 # Generate narrative
-                narrative_part = self.llm.generate(prompt, self._get_system_prompt())
-                narrative_parts.append(narrative_part)
+                narrative = self.llm.generate(prompt, self._system_prompt, stream_callback=output.write)
                 
                 # Count output tokens and update totals
-                output_tokens = self.token_counter.count_tokens(narrative_part)
-                usage = self.token_counter.add_usage(input_tokens, output_tokens)
+                output_tokens = self.token_counter.count_tokens(narrative)
+                self.token_counter.add_usage(input_tokens, output_tokens)
                 
-                # Show chunk usage
-                chunk_stats = usage['chunk']
-                print(f"\nCurrent chunk:")
-                print(f"  Input:  {chunk_stats['input_tokens']:,} tokens")
-                print(f"  Output: {chunk_stats['output_tokens']:,} tokens")
-                print(f"  Total:  {chunk_stats['total_tokens']:,} tokens")
-                print(f"  Context: {chunk_stats['context_percent']:.1f}% of window")
+                # Show usage
+                model_info = f"{self.config['llm'].get('provider', 'unknown').title()} {self.config['llm'].get('model_version', 'unknown')}"
+                usage = self.token_counter.get_running_totals()
+                print(f"\nToken usage for {model_info}:")
+                print(f"  Input:  {usage['input_tokens']:,} tokens")
+                print(f"  Output: {usage['output_tokens']:,} tokens")
+                print(f"  Total:  {usage['total_tokens']:,} tokens")
+                print(f"  Cost:   {usage['cost']}")
+            else:
+                # Process chunks and track token usage
+                chunks = self.chunker.chunk_conversation(conversation)
                 
-                # Show running totals
-                running = usage['running']
-                context = running['context_info']
-                print(f"\nRunning totals:")
-                print(f"  Input:  {running['input_tokens']:,} tokens")
-                print(f"  Output: {running['output_tokens']:,} tokens")
-                print(f"  Total:  {running['total_tokens']:,} tokens")
-                print(f"  Cost:   {running['cost']}")
+                model_info = f"{self.config['llm'].get('provider', 'unknown').title()} {self.config['llm'].get('model_version', 'unknown')}"
+                print(f"\nProcessing {len(chunks)} chunks using {model_info}:")
                 
-                # Warn if approaching context limits
-                if context['max_percent'] > 80:
-                    print(f"\nWarning: Used {context['max_percent']:.1f}% of context window")
-                    print(f"Peak usage: {context['max_used']:,} tokens at total token {context['at_tokens']:,}")
-        
-        # Save narrative
-        FileHandler.save_narrative(narrative, output_file)
+                if self.batch_chunks:
+                    prompts = [
+                        self._create_narrative_prompt(
+                            chunk,
+                            is_first_chunk=(i == 0),
+                            is_last_chunk=(i == len(chunks) - 1)
+                        )
+                        for i, chunk in enumerate(chunks)
+                    ]
+                    
+                    # Count input tokens in one batch
+                    input_counts = self.token_counter.count_tokens_batch(prompts)
+                    
+                    # Generate all chunks in one batch, writing each part out
+                    # in chunk order as soon as it and the ones before it are done
+                    writer = _OrderedPartWriter(output)
+                    output_counts: List[Any] = [None] * len(prompts)
+                    with ThreadPoolExecutor() as executor:
+                        def on_part(index: int, narrative_part: str) -> None:
+                            writer.add(index, narrative_part)
+                            # Count off the event loop; counting may be an API call
+                            output_counts[index] = executor.submit(self.token_counter.count_tokens, narrative_part)
+                        
+                        self.llm.generate_batch(prompts, self._system_prompt, result_callback=on_part)
+                        output_counts = [future.result() for future in output_counts]
+                    
+                    for i, (input_tokens, output_tokens) in enumerate(zip(input_counts, output_counts)):
+                        print(f"\nChunk {i+1}/{len(chunks)}...")
+                        input_tokens += self._get_system_tokens()
+                        self._print_chunk_usage(self.token_counter.add_usage(input_tokens, output_tokens))
+                else:
+                    # Process each chunk, building the next prompt while the
+                    # current one is generating
+                    with ThreadPoolExecutor(max_workers=1) as executor:
+                        next_prompt = executor.submit(self._build_chunk_prompt, chunks, 0)
+                        for i in range(len(chunks)):
+                            print(f"\nChunk {i+1}/{len(chunks)}...")
+                            
+                            prompt, input_tokens = next_prompt.result()
+                            if i + 1 < len(chunks):
+                                next_prompt = executor.submit(self._build_chunk_prompt, chunks, i + 1)
+                            
+                            # Generate narrative, streaming it to the output file
+                            if i:
+                                output.write(_PART_SEPARATOR)
+                            narrative_part = self.llm.generate(prompt, self._system_prompt, stream_callback=output.write)
+                            
+                            # Count output tokens and update totals
+                            output_tokens = self.token_counter.count_tokens(narrative_part)
+                            self._print_chunk_usage(self.token_counter.add_usage(input_tokens, output_tokens))
@@ -3,10 +3,35 @@
 This module provides utilities for reading and writing JSON files and managing configurations.
 """
 
+import contextlib
 import json
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, Iterator, List, TextIO, Union
 import os
 
+# orjson is optional; it parses and serializes large conversation files
+# several times faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Output directories already created by this process
+_MKDIR_CACHE = set()
+
+def _ensure_parent_dir(filepath: str) -> None:
+    """Create the directory containing filepath if needed.
+    
+    Plain filenames have no directory to create, and each directory is only
+    created once per process.
+    
+    Args:
+        filepath: Path of the file about to be written
+    """
+    directory = os.path.dirname(filepath)
+    if directory and directory not in _MKDIR_CACHE:
+        os.makedirs(directory, exist_ok=True)
+        _MKDIR_CACHE.add(directory)
+
 class FileHandler:
     """Handles file operations for the narrative writer."""
     
@@ -25,8 +50,12 @@ class FileHandler:
             json.JSONDecodeError: If file contains invalid JSON
         """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            # Read bytes so orjson can decode UTF-8 itself
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            if orjson is not None:
+                return orjson.loads(data)
+            return json.loads(data.decode('utf-8'))
         except FileNotFoundError:
             raise FileNotFoundError(f"File not found: {filepath}")
         except json.JSONDecodeError as e:
@@ -46,7 +75,16 @@ class FileHandler:
         """
         try:
             # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            _ensure_parent_dir(filepath)
+            
+            if orjson is not None:
+                # orjson writes UTF-8 bytes; non-string keys are stringified like json does
+                option = orjson.OPT_NON_STR_KEYS
+                if pretty:
+                    option |= orjson.OPT_INDENT_2
+                with open(filepath, 'wb') as f:
+                    f.write(orjson.dumps(data, option=option))
+                return
             
             with open(filepath, 'w', encoding='utf-8') as f:
                 if pretty:
@@ -74,6 +112,44 @@ class FileHandler:
         except FileNotFoundError:
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
     
+    @staticmethod
+    @contextlib.contextmanager
+    def open_narrative(output_path: str) -> Iterator[TextIO]:
+        """Open a narrative output file for incremental writing.
+        
+        Text is written to a temporary file next to output_path, which
+        replaces output_path only when the block exits without an error, so
+        a failed run leaves any existing narrative untouched.
+        
+        Args:
+            output_path: Path where to save the narrative
+            
+        Yields:
+            Text file opened for writing with a large buffer
+            
+        Raises:
+            IOError: If file cannot be written
+        """
+        tmp_path = output_path + '.tmp'
+        try:
+            # Create directory if it doesn't exist and if path contains directories
+            _ensure_parent_dir(output_path)
+            
+            f = open(tmp_path, 'w', encoding='utf-8', buffering=1 << 20)
+        except IOError as e:
+            raise IOError(f"Error writing narrative to {output_path}: {str(e)}")
+        
+        try:
+            with f:
+                yield f
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    
     @staticmethod
     def save_narrative(narrative: str, output_path: str) -> None:
         """Save generated narrative to a file.
@@ -87,9 +163,7 @@ class FileHandler:
         """
         try:
             # Create directory if it doesn't exist and if path contains directories
-            directory = os.path.dirname(output_path)
-            if directory:
-                os.makedirs(directory, exist_ok=True)
+            _ensure_parent_dir(output_path)
             
             with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(narrative)
@@ -0,0 +1,79 @@
+"""Tests for conversation chunking."""
+
+import pytest
+
+from src.processor.chunking import ConversationChunker
+from src.processor.conversation import Conversation
+
+
+def _conversation(scene_changes, length):
+    """Build a conversation with a scene change at each given index."""
+    prompts = [f"prompt {i}" for i in range(length)]
+    responses = ["Meanwhile, the rain kept falling." if i in scene_changes else "They kept talking."
+                 for i in range(length)]
+    return Conversation(prompts, responses)
+
+
+def _chunker(**processing):
+    return ConversationChunker({"processing": processing})
+
+
+def _covers(boundaries, length):
+    """Check that boundaries are contiguous and span the whole conversation."""
+    return (boundaries[0][0] == 0 and boundaries[-1][1] == length and
+            all(end == start for (_, end), (start, _) in zip(boundaries, boundaries[1:])))
+
+
+def test_splits_at_scene_changes():
+    conversation = _conversation({4, 8}, 12)
+    
+    boundaries = _chunker(min_chunk_exchanges=4).find_chunk_boundaries(conversation)
+    
+    assert boundaries == [(0, 4), (4, 8), (8, 12)]
+
+
+def test_ignores_scene_changes_closer_than_minimum():
+    conversation = _conversation({2, 4, 5, 8}, 12)
+    
+    boundaries = _chunker(min_chunk_exchanges=4).find_chunk_boundaries(conversation)
+    
+    assert boundaries == [(0, 4), (4, 8), (8, 12)]
+    assert all(end - start >= 4 for start, end in boundaries)
+
+
+def test_does_not_split_off_short_tail():
+    conversation = _conversation({4, 8}, 10)
+    
+    boundaries = _chunker(min_chunk_exchanges=4).find_chunk_boundaries(conversation)
+    
+    assert boundaries == [(0, 4), (4, 10)]
+
+
+@pytest.mark.parametrize("minimum", [0, -3])
+def test_minimum_below_one_means_no_minimum(minimum):
+    conversation = _conversation({1, 2, 3}, 5)
+    
+    boundaries = _chunker(min_chunk_exchanges=minimum).find_chunk_boundaries(conversation)
+    
+    # The first chunk always keeps its first two exchanges together
+    assert boundaries == [(0, 2), (2, 3), (3, 5)]
+
+
+def test_no_split_when_scene_splitting_disabled():
+    conversation = _conversation({4, 8}, 12)
+    
+    chunker = _chunker(min_chunk_exchanges=4, split_on_scene_changes=False)
+    
+    assert chunker.find_chunk_boundaries(conversation) == [(0, 12)]
+
+
+@pytest.mark.parametrize("length", [0, 1, 3, 7, 20])
+def test_boundaries_cover_conversation(length):
+    conversation = _conversation(set(range(0, length, 3)), length)
+    
+    boundaries = _chunker(min_chunk_exchanges=2).find_chunk_boundaries(conversation)
+    
+    if length:
+        assert _covers(boundaries, length)
+    else:
+        assert boundaries == []
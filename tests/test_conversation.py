@@ -0,0 +1,49 @@
+"""Tests for the Conversation container."""
+
+import pytest
+
+from src.processor.conversation import Conversation
+
+
+def test_from_exchanges_splits_prompts_and_responses():
+    conversation = Conversation.from_exchanges([
+        {"prompt": "p1", "response": "r1"},
+        {"prompt": "p2", "response": "r2"},
+    ])
+    
+    assert conversation.prompts == ["p1", "p2"]
+    assert conversation.responses == ["r1", "r2"]
+    assert len(conversation) == 2
+
+
+def test_from_exchanges_rejects_non_list():
+    with pytest.raises(ValueError):
+        Conversation.from_exchanges({"prompt": "p", "response": "r"})
+
+
+@pytest.mark.parametrize("exchanges", [
+    [{"prompt": "p"}],
+    [{"response": "r"}],
+    ["not an exchange"],
+])
+def test_from_exchanges_rejects_malformed_exchanges(exchanges):
+    with pytest.raises(ValueError):
+        Conversation.from_exchanges(exchanges)
+
+
+def test_index_returns_exchange_tuple():
+    conversation = Conversation(["p1", "p2"], ["r1", "r2"])
+    
+    assert conversation[1] == ("p2", "r2")
+    assert conversation[-1] == ("p2", "r2")
+
+
+def test_slice_returns_conversation():
+    conversation = Conversation(["p1", "p2", "p3"], ["r1", "r2", "r3"])
+    
+    sliced = conversation[1:]
+    
+    assert isinstance(sliced, Conversation)
+    assert sliced.prompts == ["p2", "p3"]
+    assert sliced.responses == ["r2", "r3"]
+    assert len(conversation[5:]) == 0
@@ -0,0 +1,28 @@
+"""Tests for file handling utilities."""
+
+import pytest
+
+from src.utils.file_handler import FileHandler
+
+
+def test_open_narrative_writes_file(tmp_path):
+    output_path = str(tmp_path / "out" / "narrative.txt")
+    
+    with FileHandler.open_narrative(output_path) as f:
+        f.write("Once upon a time")
+    
+    assert (tmp_path / "out" / "narrative.txt").read_text(encoding="utf-8") == "Once upon a time"
+    assert not (tmp_path / "out" / "narrative.txt.tmp").exists()
+
+
+def test_open_narrative_keeps_old_file_on_failure(tmp_path):
+    output = tmp_path / "narrative.txt"
+    output.write_text("previous narrative", encoding="utf-8")
+    
+    with pytest.raises(RuntimeError):
+        with FileHandler.open_narrative(str(output)) as f:
+            f.write("partial")
+            raise RuntimeError("generation failed")
+    
+    assert output.read_text(encoding="utf-8") == "previous narrative"
+    assert not (tmp_path / "narrative.txt.tmp").exists()
@@ -0,0 +1,87 @@
+"""Tests for conversation token counting."""
+
+import pytest
+
+from src.llm.provider import LLMProvider
+from src.llm.token_counter import TokenCounter, _PER_MSG_OVERHEAD, _CHARS_PER_TOKEN
+from src.processor.conversation import Conversation
+
+
+class WordCountProvider(LLMProvider):
+    """Provider counting one token per whitespace-separated word."""
+    
+    def __init__(self, config):
+        super().__init__(config)
+        self.counted = []
+    
+    def count_tokens(self, text):
+        self.counted.append(text)
+        return len(text.split())
+    
+    def generate(self, prompt, system_prompt=None, stream_callback=None):
+        raise NotImplementedError
+
+
+def _counter(max_input_tokens=1000):
+    config = {"max_input_tokens": max_input_tokens}
+    return TokenCounter(config, provider=WordCountProvider(config))
+
+
+def test_counts_each_exchange_with_message_overhead():
+    conversation = Conversation(["one two", "three"], ["four five six", "seven"])
+    
+    total = _counter().count_conversation_tokens(conversation)
+    
+    assert total == 7 + 2 * _PER_MSG_OVERHEAD
+
+
+def test_recount_only_tokenizes_new_exchanges():
+    counter = _counter()
+    counter.count_conversation_tokens(Conversation(["a b"], ["c"]))
+    counter.provider.counted.clear()
+    
+    total = counter.count_conversation_tokens(Conversation(["a b", "d"], ["c", "e f"]))
+    
+    assert total == 6 + 2 * _PER_MSG_OVERHEAD
+    assert counter.provider.counted == ["d", "e f"]
+
+
+def test_recount_of_different_conversation_starts_over():
+    counter = _counter()
+    counter.count_conversation_tokens(Conversation(["a b", "c"], ["d", "e"]))
+    
+    total = counter.count_conversation_tokens(Conversation(["x"], ["y z"]))
+    
+    assert total == 3 + _PER_MSG_OVERHEAD
+
+
+def _conversation_of_chars(chars, char="a"):
+    return Conversation([char * chars], [""])
+
+
+def test_fast_fits_clearly_under_limit():
+    counter = _counter()
+    chars = int(counter.effective_limit * 0.9 * _CHARS_PER_TOKEN) - 1
+    
+    assert counter.fast_fits(_conversation_of_chars(chars)) is True
+
+
+def test_fast_fits_clearly_over_limit():
+    counter = _counter()
+    chars = int(counter.effective_limit * 1.05 * _CHARS_PER_TOKEN) + 1
+    
+    assert counter.fast_fits(_conversation_of_chars(chars)) is False
+
+
+@pytest.mark.parametrize("fraction", [0.9, 1.0, 1.05])
+def test_fast_fits_undecided_near_limit(fraction):
+    counter = _counter()
+    chars = int(counter.effective_limit * fraction * _CHARS_PER_TOKEN)
+    
+    assert counter.fast_fits(_conversation_of_chars(chars)) is None
+
+
+def test_fast_fits_never_declares_non_ascii_fitting():
+    counter = _counter()
+    
+    assert counter.fast_fits(_conversation_of_chars(10, char="猫")) is None